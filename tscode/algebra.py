@@ -55,6 +55,20 @@ def dihedral(p):
     
     return np.degrees(np.arctan2(y, x))
 
+@nb.njit
+def dihedrals_batch(coords, quadruplets):
+    '''
+    Returns the dihedral angles in degrees for each
+    of the (n,4) quadruplets of indices of coords,
+    in a single compiled loop.
+
+    '''
+    angles = np.empty(len(quadruplets))
+    for i in range(len(quadruplets)):
+        angles[i] = dihedral(coords[quadruplets[i]])
+
+    return angles
+
 @nb.njit
 def vec_angle(v1, v2):
     v1_u = norm(v1)
@@ -156,12 +170,6 @@ def all_dists(A, B):
             
     return C
 
-@nb.njit
-def kronecker_delta(i, j) -> int:
-    if i == j:
-        return 1
-    return 0
-
 @nb.njit
 def get_inertia_moments(coords, masses):
     '''
@@ -171,56 +179,47 @@ def get_inertia_moments(coords, masses):
     '''
     
     coords -= center_of_mass(coords, masses)
-    inertia_moment_matrix = np.array([[0.,0.,0.],
-                                      [0.,0.,0.],
-                                      [0.,0.,0.]])
 
-    for i in range(3):
-        for j in range(3):
-            k = kronecker_delta(i,j)
-            inertia_moment_matrix[i][j] = sum([masses[n]*((norm_of(coords[n])**2)*k - coords[n][i]*coords[n][j])
-                                                  for n, _ in enumerate(coords)])
+    weighted_coords = coords * masses.reshape(-1,1)
+    inertia_moment_matrix = (np.eye(3) * np.sum(weighted_coords * coords) -
+                             np.ascontiguousarray(weighted_coords.T) @ coords)
+    # I = sum_n(m_n * (|r_n|^2 * delta_ij - r_ni * r_nj)), in one broadcast
 
-    inertia_moment_matrix = diagonalize(inertia_moment_matrix)
-
-    return np.diag(inertia_moment_matrix)
+    # the tensor is real symmetric and positive semidefinite: the
+    # symmetric solver returns its eigenvalues already sorted
+    return np.linalg.eigvalsh(inertia_moment_matrix)
 
 @nb.njit
 def get_moi_similarity_matches(structures, masses, max_deviation=1e-2):
     ''''''
     _l = len(structures)
-    mat = np.zeros((_l,_l), dtype=nb.boolean)
+
+    moments = np.empty((_l,3))
+    for i in range(_l):
+        moments[i] = get_inertia_moments(structures[i], masses)
+    # computed once per structure rather than once per pair
+
+    matches = [(0, 0) for _ in range(0)]
+    # typed empty list: matches are stored as they are found,
+    # rather than in a dense (l, l) boolean matrix
+
     for i in range(_l):
-        im_i = get_inertia_moments(structures[i], masses)
+        im_i = moments[i]
         for j in range(i+1,_l):
-            im_j = get_inertia_moments(structures[j], masses)
+            im_j = moments[j]
             rel_delta = np.abs(im_i - im_j) / im_i
             if np.all(rel_delta < max_deviation):
-                mat[i,j] = 1
+                matches.append((i,j))
                 break
 
-    where = np.where(mat)
-    matches = [(i,j) for i,j in zip(where[0], where[1])]
-
     return matches
 
-@nb.njit
-def diagonalize(A):
-    eigenvalues_of_A, eigenvectors_of_A = np.linalg.eig(A)
-    B = eigenvectors_of_A[:,np.abs(eigenvalues_of_A).argsort()]   
-    diagonal_matrix= np.dot(np.linalg.inv(B), np.dot(A, B))
-    return diagonal_matrix
-
 @nb.njit
 def center_of_mass(coords, masses):
     '''
     Returns the center of mass for the atomic system.
     '''
-    total_mass = sum([masses[i] for i in range(len(coords))])
-    w = np.array([0.,0.,0.])
-    for i in range(len(coords)):
-        w += coords[i]*masses[i]
-    return w / total_mass
+    return (masses @ coords) / np.sum(masses)
 
 @nb.njit
 def internal_mean(arr):
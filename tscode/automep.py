@@ -1,16 +1,19 @@
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 from networkx import cycle_basis
+from numba import njit
 
-from tscode.algebra import dihedral
+from tscode.algebra import dihedrals_batch
 from tscode.calculators._xtb import xtb_opt
 from tscode.graph_manipulations import neighbors
 from tscode.optimization_methods import optimize
 from tscode.utils import graphize, write_xyz
 
 
-def automep(embedder, n_images=7):
+def automep(embedder, n_images=7, refine_maxiter=50):
 
     assert embedder.options.calculator == "XTB"
 
@@ -25,6 +28,10 @@ def automep(embedder, n_images=7):
     embedder.log('--> AutoMEP - Building MEP for 7-membered ring inversion')
     embedder.log(f'    Preoptimizing starting point at {embedder.options.calculator}/{embedder.options.theory_level}({embedder.options.solvent}) level')
 
+    restart_file = os.path.realpath(f'{mol.rootname}_automep.xtbrestart')
+    # wavefunction of the preoptimized structure, reused as
+    # initial guess by all images since they start from it
+
     coords, _, _ = optimize(
                             coords,
                             mol.atomnos,
@@ -34,60 +41,190 @@ def automep(embedder, n_images=7):
                             solvent=embedder.options.solvent,
                             title=f'temp',
                             logfunction=embedder.log,
+                            save_restart=restart_file,
                             )
 
-    dihedrals = cycle_to_dihedrals(cycles[0])
-    exocyclic = get_exocyclic_dihedrals(graph, cycles[0])
+    cycle = np.array(cycles[0])
+    dihedrals = cycle_to_dihedrals(cycle)
+    exocyclic = get_exocyclic_dihedrals(graph, cycle)
+    constrained_dihedrals = np.concatenate((dihedrals, exocyclic))
+    # (n_dihedrals, 4) array of indices
+
+    start_angles = dihedrals_batch(coords, constrained_dihedrals)
+    target_angles = np.concatenate((np.zeros(len(dihedrals)), np.full(len(exocyclic), 180.)))
+    multipliers = np.linspace(1, -1, n_images)[:, None]
+
+    mep_angles = multipliers * (start_angles - target_angles)
+    mep_angles += target_angles
+    np.remainder(mep_angles, 360, out=mep_angles)
+    # (n_images, n_dihedrals) array, one row of target angles per image,
+    # interpolated and wrapped in a single buffer
+
+    chain_restart_file = os.path.realpath(f'{mol.rootname}_automep_chain.xtbrestart')
+    # wavefunction of the last image along the path, passed
+    # from one image to the next in the refinement pass
+
+    futures = []
+    with ProcessPoolExecutor(max_workers=min(embedder.threads, n_images)) as executor:
+
+        for i, m_a in enumerate(mep_angles):
+            future = executor.submit(
+                    _optimize_image,
+                    coords,
+                    mol.atomnos,
+                    constrained_dihedrals,
+                    m_a,
+                    embedder.options.theory_level,
+                    embedder.options.solvent,
+                    embedder.procs,
+                    f'automep_{i}',
+                    restart_file,
+                    save_restart=chain_restart_file if i == 0 else None,
+                )
+            futures.append(future)
+        # images are independent constrained optimizations from the
+        # preoptimized structure, so they run in parallel, each
+        # in its own working directory
+
+        with open(f"{mol.rootname}_automep.xyz", "w") as f:
+            for i in range(n_images):
+
+                image, _, elapsed = futures[i].result()
+                futures[i] = None
+                # release the result as soon as it is collected
+
+                embedder.log('    - optimized image %d/%d (%.3f s)', i+1, n_images, elapsed)
+
+                if i > 0:
+                    refined, energy, elapsed = _optimize_image(
+                                                     image,
+                                                     mol.atomnos,
+                                                     constrained_dihedrals,
+                                                     mep_angles[i],
+                                                     embedder.options.theory_level,
+                                                     embedder.options.solvent,
+                                                     embedder.procs,
+                                                     'automep_refine',
+                                                     chain_restart_file,
+                                                     save_restart=chain_restart_file,
+                                                     maxiter=refine_maxiter,
+                                                    )
+                    # each image from the parallel pass is refined for a few steps,
+                    # starting from the wavefunction of the previous image along
+                    # the path, so that consecutive images stay continuous
+
+                    if energy is None:
+                        embedder.log('    - refinement of image %d/%d did not converge in %d steps (%.3f s), keeping unrefined image',
+                                     i+1, n_images, refine_maxiter, elapsed)
+                        # xtb only writes an optimized structure on convergence
+
+                    else:
+                        embedder.log('    - refined image %d/%d (%.3f s)', i+1, n_images, elapsed)
+                        image = refined
+
+                write_xyz(image, mol.atomnos, f)
+                f.flush()
+                # images are written as soon as they are collected and
+                # refined, in order, while later ones are still running
+
+    for filename in (restart_file, chain_restart_file):
+        if os.path.isfile(filename):
+            os.remove(filename)
 
-    start_angles = np.array([dihedral(coords[d]) for d in dihedrals+exocyclic])
-    target_angles = np.array([0 for _ in dihedrals] + [180 for _ in exocyclic])
-    multipliers = np.linspace(1, -1, n_images)
+    embedder.log(f"\n--> Saved autogenerated MEP as {mol.rootname}_automep.xyz\n")
 
-    mep_angles = [(start_angles * m + target_angles * (1-m)) % 360 for m in multipliers]
+    return f"{mol.rootname}_automep.xyz"
 
-    mep = []
-    for i, m_a in enumerate(mep_angles):
-        t_start = time.perf_counter()
-        coords, _, _ = xtb_opt(coords,
-                                mol.atomnos,
-                                constrained_dihedrals=dihedrals+exocyclic,
-                                constrained_dih_angles=m_a,
-                                method=embedder.options.theory_level,
-                                solvent=embedder.options.solvent,
-                                procs=embedder.procs)
-        embedder.log(f'    - optimized image {i+1}/{len(mep_angles)} ({round(time.perf_counter()-t_start, 3)} s)')
-        mep.append(coords)
+def _optimize_image(coords, atomnos, dihedrals, angles, method, solvent, procs, title, restart_file,
+                    save_restart=None, maxiter=None):
+    '''
+    Optimizes a single MEP image with the dihedrals constrained
+    to the target angles. Returns the optimized coordinates, their
+    energy and the elapsed time. Defined at module level to be picklable.
+    '''
+    t_start = time.perf_counter()
+    coords, energy, _ = xtb_opt(coords,
+                                atomnos,
+                                constrained_dihedrals=dihedrals,
+                                constrained_dih_angles=angles,
+                                method=method,
+                                solvent=solvent,
+                                procs=procs,
+                                title=title,
+                                maxiter=maxiter,
+                                restart_file=restart_file,
+                                save_restart=save_restart)
+
+    return coords, energy, time.perf_counter()-t_start
 
-    with open(f"{mol.rootname}_automep.xyz", "w") as f:
-        for c in mep:
-            write_xyz(c, mol.atomnos, f)
+def get_exocyclic_dihedrals(graph, cycle):
+    '''
+    Returns a (n,4) array with a dihedral for each exocyclic
+    bond of the cycle: (exocyclic atom, ring atom, two ring atoms).
+    '''
+    nbrs = [neighbors(graph, i) for i in range(len(graph))]
 
-    embedder.log(f"\n--> Saved autogenerated MEP as {mol.rootname}_automep.xyz\n")
+    adjacency = np.full((len(nbrs), max(len(n) for n in nbrs)), -1, dtype=np.int32)
+    for i, n in enumerate(nbrs):
+        adjacency[i, :len(n)] = n
+    # neighbors of each atom, padded with -1
 
-    return f"{mol.rootname}_automep.xyz"
+    in_cycle = np.zeros(len(nbrs), dtype=np.bool_)
+    in_cycle[cycle] = True
 
-def get_exocyclic_dihedrals(graph, cycle):
+    ring_nbrs = np.full(adjacency.shape, -1, dtype=np.int32)
+    for i in cycle:
+        nbr_set = set(nbrs[i])
+        ring_i = [j for j in cycle if j in nbr_set]
+        ring_nbrs[i, :len(ring_i)] = ring_i
+    # ring neighbors of each ring atom, in cycle order and padded with -1
+
+    return _get_exocyclic_dihedrals(cycle, adjacency, in_cycle, ring_nbrs)
+
+@njit
+def _get_exocyclic_dihedrals(cycle, adjacency, in_cycle, ring_nbrs):
     '''
+    Compiled kernel of get_exocyclic_dihedrals: adjacency and ring_nbrs
+    are (n_atoms, max_neighbors) arrays of neighbors and ring neighbors
+    (in cycle order), padded with -1.
     '''
-    exo_dihs = []
+    n_exo = 0
+    for index in cycle:
+        for exo_id in adjacency[index]:
+            if exo_id != -1 and not in_cycle[exo_id]:
+                n_exo += 1
+
+    exo_dihs = np.empty((n_exo, 4), dtype=np.int32)
+
+    k = 0
     for index in cycle:
-        for exo_id in neighbors(graph, index):
-            if exo_id not in cycle:
-                dummy1 = next(i for i in cycle if i not in (exo_id, index) and i in neighbors(graph, index))
-                dummy2 = next(i for i in cycle if i not in (exo_id, index, dummy1) and i in neighbors(graph, dummy1))
-                exo_dihs.append([exo_id, index, dummy1, dummy2])
+        for exo_id in adjacency[index]:
+            if exo_id == -1 or in_cycle[exo_id]:
+                continue
+
+            dummy1 = ring_nbrs[index, 0]
+            # first ring atom bonded to index
+
+            dummy2 = ring_nbrs[dummy1, 0] if ring_nbrs[dummy1, 0] != index else ring_nbrs[dummy1, 1]
+            # first ring atom bonded to dummy1, other than index
 
-    return exo_dihs    
+            exo_dihs[k, 0] = exo_id
+            exo_dihs[k, 1] = index
+            exo_dihs[k, 2] = dummy1
+            exo_dihs[k, 3] = dummy2
+            k += 1
 
+    return exo_dihs
+
+@njit
 def cycle_to_dihedrals(cycle):
     '''
+    Returns a (n,4) array with the n dihedrals of a cycle of n atoms.
     '''
-    dihedrals = []
-    for i in range(len(cycle)):
-
-        a = cycle[i % len(cycle)]
-        b = cycle[(i+1) % len(cycle)]
-        c = cycle[(i+2) % len(cycle)]
-        d = cycle[(i+3) % len(cycle)]
-        dihedrals.append([a, b, c, d])
-    return dihedrals
\ No newline at end of file
+    n = len(cycle)
+    dihedrals = np.empty((n, 4), dtype=np.int32)
+    for i in range(n):
+        for j in range(4):
+            dihedrals[i, j] = cycle[(i+j) % n]
+
+    return dihedrals
@@ -18,9 +18,10 @@ GNU General Public License for more details.
 import sys
 from subprocess import DEVNULL, STDOUT, check_call
 
+from tscode.pt import element_symbols
 from tscode.settings import COMMANDS, MEM_GB
 from tscode.solvents import get_solvent_line
-from tscode.utils import clean_directory, pt, read_xyz
+from tscode.utils import clean_directory, read_xyz
 
 
 def gaussian_opt(coords, atomnos, constrained_indices=None, method='PM6', procs=1, solvent=None, title='temp', read_output=True, **kwargs):
@@ -48,7 +49,7 @@ def gaussian_opt(coords, atomnos, constrained_indices=None, method='PM6', procs=
     if procs > 1:
         s += f'%nprocshared={procs}\n'
 
-    s = '# opt ' if constrained_indices is not None else '# opt=modredundant '
+    s += '# opt ' if constrained_indices is not None else '# opt=modredundant '
     s += method
     
     if solvent is not None:
@@ -56,8 +57,9 @@ def gaussian_opt(coords, atomnos, constrained_indices=None, method='PM6', procs=
     
     s += '\n\nGaussian input generated by TSCoDe\n\n0 1\n'
 
-    for i, atom in enumerate(coords):
-        s += '%s     % .6f % .6f % .6f\n' % (pt[atomnos[i]].symbol, atom[0], atom[1], atom[2])
+    s += ''.join(['%s     % .6f % .6f % .6f\n' % (symbol, atom[0], atom[1], atom[2])
+                  for symbol, atom in zip(element_symbols[atomnos], coords.tolist())])
+    # coordinates block is formatted in one pass and appended once
 
     s += '\n'
 
@@ -66,7 +68,6 @@ def gaussian_opt(coords, atomnos, constrained_indices=None, method='PM6', procs=
         for a, b in constrained_indices:
             s += 'B %s %s F\n' % (a+1, b+1) # Gaussian numbering starts at 1
 
-    s = ''.join(s)
     with open(f'{title}.com', 'w') as f:
         f.write(s)
     
@@ -222,7 +222,7 @@ def mopac_opt(coords, atomnos, constrained_indices=None, method='PM7', solvent=N
 
     if read_output:
 
-        inv_order = [order.index(i) for i, _ in enumerate(order)]
+        inv_order = np.argsort(order)
         # undoing the atomic scramble that was needed by the mopac input requirements
 
         opt_coords, energy, success = read_mop_out(f'{title}.out')
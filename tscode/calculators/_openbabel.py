@@ -15,8 +15,12 @@ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 
 '''
+from io import StringIO
+
+import numpy as np
+
 from tscode.settings import FF_OPT_BOOL, FF_CALC
-from tscode.utils import clean_directory, scramble_check, write_xyz, read_xyz
+from tscode.utils import scramble_check, write_xyz
 from tscode.algebra import norm, norm_of
 
 if FF_OPT_BOOL and FF_CALC == 'OB':
@@ -81,19 +85,16 @@ if FF_OPT_BOOL and FF_CALC == 'OB':
                 delta = d - target_d
                 structure[b] -= norm(structure[b] - structure[a]) * delta
 
-        filename=f'{title}_in.xyz'
-
-        with open(filename, 'w') as f:
-            write_xyz(structure, atomnos, f)
-        # input()
-        outname = f'{title}_out.xyz'
+        buffer = StringIO()
+        write_xyz(structure, atomnos, buffer)
+        # the structure is passed to openbabel in memory,
+        # sparing a file write/read per optimization
 
         # Standard openbabel molecule load
         conv = ob.OBConversion()
-        conv.SetInAndOutFormats('xyz','xyz')
+        conv.SetInFormat('xyz')
         mol = ob.OBMol()
-        more = conv.ReadFile(mol, filename)
-        i = 0
+        conv.ReadString(mol, buffer.getvalue())
 
         # Define constraints
         constraints = ob.OBFFConstraints()
@@ -131,13 +132,9 @@ if FF_OPT_BOOL and FF_CALC == 'OB':
         forcefield.GetCoordinates(mol)
         energy = forcefield.Energy() * 0.2390057361376673 # kJ/mol to kcal/mol
 
-        # Write the mol to a file
-        conv.WriteFile(mol,outname)
-        conv.CloseOutFile()
-
-        opt_coords = read_xyz(outname).atomcoords[0]
-
-        clean_directory((f'{title}_in.xyz', f'{title}_out.xyz'))
+        # Read the optimized coordinates directly from the mol
+        opt_coords = np.array([[atom.GetX(), atom.GetY(), atom.GetZ()]
+                               for atom in ob.OBMolAtomIter(mol)])
         
         if check:
             success = scramble_check(opt_coords, atomnos, constrained_indices, graphs)
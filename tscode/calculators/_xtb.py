@@ -47,6 +47,8 @@ def xtb_opt(
         constrain_string=None,
         recursive_stepsize=0.3,
         spring_constant=1000,
+        restart_file=None,
+        save_restart=None,
         **kwargs,
         ):
     '''
@@ -96,6 +98,11 @@ def xtb_opt(
 
     spring_constant: stiffness of harmonic distance constraint (Hartrees/Bohrs^2)
 
+    restart_file: path of an xtbrestart file from a previous calculation on a
+    similar structure, used as initial wavefunction guess if it exists.
+
+    save_restart: path where the final xtbrestart file is copied after the run.
+
     '''
 
     if title in os.listdir():
@@ -209,7 +216,13 @@ def xtb_opt(
     with open(f'{title}.inp', 'w') as f:
         f.write(s)
     
-    flags = '--norestart'
+    if restart_file is not None and os.path.isfile(restart_file):
+        shutil.copy(restart_file, 'xtbrestart')
+        flags = '--restart'
+        # start the SCF from a converged wavefunction
+
+    else:
+        flags = '--norestart'
     
     if opt:
         flags += f' --opt {conv_thr}'
@@ -251,6 +264,9 @@ def xtb_opt(
         print('KeyboardInterrupt requested by user. Quitting.')
         sys.exit()
 
+    if save_restart is not None and 'xtbrestart' in os.listdir():
+        shutil.copy('xtbrestart', save_restart)
+
     if read_output:
         
         if opt:
@@ -134,7 +134,13 @@ class Embedder:
             logging.exception(e)
             raise e
 
-    def log(self, string='', p=True):
+    def log(self, string='', *args, p=True):
+        '''
+        Print string and write it to the log file. If args are
+        provided, they are %-formatted into string only here.
+        '''
+        if args:
+            string = string % args
         if p:
             print(string)
         string += '\n'
@@ -829,7 +835,7 @@ class Embedder:
         sys.exit()
 
     def scramble(self, array, sequence):
-        return np.array([array[s] for s in sequence])
+        return np.asarray(array)[np.asarray(sequence, dtype=int)]
 
     def get_pairing_dist_from_letter(self, letter):
         '''
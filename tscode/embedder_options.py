@@ -41,6 +41,9 @@ keywords_list = [
                                 # clashing. The more forgiving, the more structures will reach
                                 # the geometry optimization step. Syntax: `CLASHES(num=3,dist=1.2)`
             
+            'CSEARCH',        # Run conformational augmentation of the embedded poses
+                                # through the TSCoDe conformational search engine.
+
             'DEEP',           # Performs a deeper search, retaining more starting points
                                 # for calculations and smaller turning angles.
 
@@ -50,6 +53,9 @@ keywords_list = [
                                 # in Angstroms. Syntax uses parenthesis and commas:
                                 # `DIST(a=2.345,b=3.67,c=2.1)`
 
+            'DRYRUN',         # Stop the run after input parsing and setup,
+                                # without embedding or optimizing anything.
+
             # 'ENANTIOMERS',    # Do not discard enantiomeric structures.
 
             'EZPROT',         # Double bond protection
@@ -143,12 +149,43 @@ keywords_list = [
             'THREADS',       # Change the number of maximum concurrent processes (default is 4)
 ]
 
+keywords_set = frozenset(keywords_list)
+# for constant-time keyword validation
+
 class Truthy_struct:
     def __bool__(self):
         return True
 
 class Options:
 
+    repr_if_true = (
+        'bypass',
+        'check_structures',
+        'debug',
+        'let',
+        'metadynamics',
+        'nci',
+        'neb',
+        'saddle',
+        'ts',
+        'ff_opt',
+        'noembed',
+        'keep_hb',
+        'operators',
+        'dryrun',
+        'shrink',
+        'rigid',
+        'suprafacial',
+        'fix_angles_in_deformation',
+        'double_bond_protection',
+    )
+    # options shown in __repr__ only if set
+
+    repr_if_not_none = (
+        'kcal_thresh',
+        'solvent',
+    )
+
     def __init__(self):
 
         self.rotation_range = 90
@@ -212,41 +249,15 @@ class Options:
         # Analogous dictionary that will contain the seuquences of operators for each molecule
 
     def __repr__(self):
-        d = {var:self.__getattribute__(var) for var in dir(self) if var[0:2] != '__'}
-        
-        repr_if_true = (
-            'bypass',
-            'check_structures',
-            'debug',
-            'let',
-            'metadynamics',
-            'nci',
-            'neb',
-            'saddle',
-            'ts',
-            'ff_opt',
-            'noembed',
-            'keep_hb',
-            'operators',
-            'keep_hb',
-            'dryrun',
-            'shrink',
-            'rigid',
-            'suprafacial',
-            'fix_angles_in_deformation',
-            'double_bond_protection',
-        )
-        
-        for name in repr_if_true:
-            if not d.get(name, True):
-                d.pop(name)
+        d = dict(sorted(vars(self).items()))
+        # options are instance attributes: reading the instance
+        # dictionary avoids the dir() lookups of class attributes
 
-        repr_if_not_none = (
-            'kcal_thresh',
-            'solvent',
-        )
+        for name in self.repr_if_true:
+            if not d[name]:
+                d.pop(name)
 
-        for name in repr_if_not_none:
+        for name in self.repr_if_not_none:
             if d[name] is None:
                 d.pop(name)
 
@@ -263,19 +274,30 @@ class OptionSetter:
 
         embedder.kw_line = embedder.kw_line if hasattr(embedder, 'kw_line') else ''
 
+        words = embedder.kw_line.split()
+        # tokenize the keyword line only once
+
         self.keywords = [word.split('=')[0].upper() if not '(' in word
                                 else word.split('(')[0].upper()
-                                for word in embedder.kw_line.split()]
+                                for word in words]
+
+        self.keywords_simple = [k.upper() for k in words]
+        self.keywords_simple_case_sensitive = words
+
+        self._kw_index = {}
+        for i, k in enumerate(self.keywords):
+            self._kw_index.setdefault(k, i)
+        # position of the first occurrence of each keyword
 
-        self.keywords_simple = [k.upper() for k in embedder.kw_line.split()]
-        self.keywords_simple_case_sensitive = embedder.kw_line.split()
         self.embedder = embedder
         self.args = args
 
-        if not all(k in keywords_list for k in self.keywords):
-            for k in self.keywords:
-                if k not in keywords_list:
-                    SyntaxError(f'Keyword {k} was not understood. Please check your syntax.')
+        for k in self.keywords:
+            if k not in keywords_set:
+                raise SyntaxError(f'Keyword {k} was not understood. Please check your syntax.')
+
+        self._setters = {kw: getattr(self, kw.lower()) for kw in keywords_list}
+        # dispatch table from keywords to their setter methods
 
         if self.keywords_simple:
             embedder.log('--> Parsed keywords are:\n    ' + ' '.join(self.keywords_simple) + '\n')
@@ -305,11 +327,11 @@ class OptionSetter:
         options.optimization = False
 
     def charge(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('CHARGE')]
+        kw = self.keywords_simple[self._kw_index['CHARGE']]
         options.charge = int(kw.split('=')[1])
 
     def confs(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('CONFS')]
+        kw = self.keywords_simple[self._kw_index['CONFS']]
         options.max_confs = int(kw.split('=')[1])
 
     def dryrun(self, options, *args):
@@ -325,22 +347,22 @@ class OptionSetter:
         options.clash_thresh = 1.4
 
     def rotrange(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('ROTRANGE')]
+        kw = self.keywords_simple[self._kw_index['ROTRANGE']]
         options.rotation_range = int(kw.split('=')[1])
 
     def steps(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('STEPS')]
+        kw = self.keywords_simple[self._kw_index['STEPS']]
         options.custom_rotation_steps = int(kw.split('=')[1])
 
     def rmsd(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('RMSD')]
+        kw = self.keywords_simple[self._kw_index['RMSD']]
         options.rmsd = float(kw.split('=')[1])
 
     def noopt(self, options, *args):
         options.optimization = False
 
     def ffopt(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('FFOPT')]
+        kw = self.keywords_simple[self._kw_index['FFOPT']]
         value = kw.split('=')[1].upper()
         if value not in ('ON', 'OFF'):
             raise SystemExit('FFOPT keyword can only have value \'ON\' or \'OFF\' (i.e. \'FFOPT=OFF\')')
@@ -348,15 +370,11 @@ class OptionSetter:
         options.ff_opt = True if value == 'ON' else False
 
     def images(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('IMAGES')]
+        kw = self.keywords_simple[self._kw_index['IMAGES']]
         options.images = int(kw.split('=')[1])
 
-    def bypass(self, options, *args):
-        options.bypass = True
-        options.optimization = False
-
     def dist(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('DIST')]
+        kw = self.keywords_simple[self._kw_index['DIST']]
         orb_string = kw[5:-1].lower().replace(' ','')
         # orb_string looks like 'a=2.345,b=3.456,c=2.22'
 
@@ -364,7 +382,7 @@ class OptionSetter:
         embedder._set_custom_orbs(orb_string)
 
     def clashes(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('CLASHES')]
+        kw = self.keywords_simple[self._kw_index['CLASHES']]
         clashes_string = kw[8:-1].lower().replace(' ','')
         # clashes_string now looks like 'num=3,dist=1.2'
 
@@ -379,7 +397,7 @@ class OptionSetter:
                                     'Correct syntax looks like: CLASHES(num=3,dist=1.2)'))
         
     def newbonds(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('NEWBONDS')]
+        kw = self.keywords_simple[self._kw_index['NEWBONDS']]
         options.max_newbonds = int(kw.split('=')[1])
 
     def neb(self, options, *args):
@@ -387,7 +405,7 @@ class OptionSetter:
         options.neb.images = 6
         options.neb.preopt = False
 
-        kw = self.keywords_simple[self.keywords.index('NEB')]
+        kw = self.keywords_simple[self._kw_index['NEB']]
         neb_options_string = kw[4:-1].lower().replace(' ','')
         # neb_options_string now looks like 'images=8,preopt=true' or ''
 
@@ -404,7 +422,7 @@ class OptionSetter:
                                         'Correct syntax looks like: NEB(images=8,preopt=true)'))
         
     def level(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('LEVEL')]
+        kw = self.keywords_simple[self._kw_index['LEVEL']]
         options.theory_level = kw.split('=')[1].upper().replace('_', ' ')
 
         options.theory_level = options.theory_level.replace('[', '(').replace(']', ')')
@@ -414,7 +432,7 @@ class OptionSetter:
         # when/if a major rewrite of the option setting happens.
 
     def fflevel(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('FFLEVEL')]
+        kw = self.keywords_simple[self._kw_index['FFLEVEL']]
         options.ff_level = kw.split('=')[1].upper().replace('_', ' ')
 
     def rigid(self, options, *args):
@@ -433,12 +451,12 @@ class OptionSetter:
         options.check_structures = True
 
     def kcal(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('KCAL')]
+        kw = self.keywords_simple[self._kw_index['KCAL']]
         options.kcal_thresh = float(kw.split('=')[1])
 
     def shrink(self, options, *args):
         options.shrink = True
-        kw = self.keywords_simple[self.keywords.index('SHRINK')]
+        kw = self.keywords_simple[self._kw_index['SHRINK']]
 
         parsed = kw.split('=')
         options.shrink_multiplier = float(parsed[1]) if len(parsed) > 1 else 1.5
@@ -450,22 +468,22 @@ class OptionSetter:
         options.debug = True
 
     def procs(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('PROCS')]
+        kw = self.keywords_simple[self._kw_index['PROCS']]
         self.embedder.procs = int(kw.split('=')[1])
 
     def threads(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('THREADS')]
+        kw = self.keywords_simple[self._kw_index['THREADS']]
         self.embedder.threads = int(kw.split('=')[1])
 
     def ezprot(self, options, *args):
         options.double_bond_protection = True
 
     def calc(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('CALC')]
+        kw = self.keywords_simple[self._kw_index['CALC']]
         options.calculator = kw.split('=')[1]
 
     def ffcalc(self, options, *args):
-        kw = self.keywords_simple[self.keywords.index('FFCALC')]
+        kw = self.keywords_simple[self._kw_index['FFCALC']]
         options.ff_calc = kw.split('=')[1]
 
     def mtd(self, options, *args):
@@ -502,12 +520,12 @@ class OptionSetter:
 
     def solvent(self, options, *args):
         from tscode.solvents import solvent_synonyms
-        kw = self.keywords_simple[self.keywords.index('SOLVENT')]
+        kw = self.keywords_simple[self._kw_index['SOLVENT']]
         solvent = kw.split('=')[1].lower()
         options.solvent = solvent_synonyms.get(solvent, solvent)
 
     def pka(self, options, *args):
-        kw = self.keywords_simple_case_sensitive[self.keywords.index('PKA')]
+        kw = self.keywords_simple_case_sensitive[self._kw_index['PKA']]
         pka_string, pka = kw.split('=')
         molname = pka_string[4:-1].replace(' ','')
 
@@ -526,8 +544,7 @@ class OptionSetter:
         # self.keywords = sorted(self.keywords, key=lambda x: __keywords__.index(x))
 
         for kw in self.keywords:
-            setter_function = getattr(self, kw.lower())
-            setter_function(self.embedder.options, self.embedder, *self.args)
+            self._setters[kw](self.embedder.options, self.embedder, *self.args)
 
         if any('refine>' in op for op in self.embedder.options.operators) or self.embedder.options.noembed:
-            self._refine_operator_routine()
\ No newline at end of file
+            self._refine_operator_routine()
@@ -139,7 +139,7 @@ class Hypermolecule:
         self.graph = graphize(self.atomcoords[0], self.atomnos)
         # show_graph(self)
 
-        self.atoms = np.array([atom for structure in self.atomcoords for atom in structure])       # single list with all atomic positions
+        self.atoms = self.atomcoords.reshape(-1,3)       # single array with all atomic positions
         
         if self.debug:
             print(f'DEBUG--> Total of {len(self.atoms)} atoms')
@@ -300,9 +300,7 @@ class Hypermolecule:
         self.weights = np.array([weights / np.sum(weights) for weights in self.weights])
         self.weights = flatten(self.weights)
 
-        self.dimensions = (max([coord[0] for coord in self.hypermolecule]) - min([coord[0] for coord in self.hypermolecule]),
-                           max([coord[1] for coord in self.hypermolecule]) - min([coord[1] for coord in self.hypermolecule]),
-                           max([coord[2] for coord in self.hypermolecule]) - min([coord[2] for coord in self.hypermolecule]))
+        self.dimensions = tuple(self.hypermolecule.max(axis=0) - self.hypermolecule.min(axis=0))
 
     def write_hypermolecule(self):
         '''
@@ -578,10 +578,11 @@ def scan_operator(filename, embedder):
 
         embedder.log(f'Step {i+1}/{max_iterations} - d={round(d, 2)} A - {round(energy-e_0, 2):4} kcal/mol - {time_to_string(time.perf_counter()-t_start)}')
 
+        min_e = min(energies)
         with open("temp_scan.xyz", "w") as f:
             for i, (s, d, e) in enumerate(zip(structures, dists, energies)):
                 write_xyz(s, mol.atomnos, f, title=f'Scan point {i+1}/{len(structures)} ' +
-                        f'- d({i1}-{i2}) = {round(d, 3)} A - Rel. E = {round(e-min(energies), 2)} kcal/mol')
+                        f'- d({i1}-{i2}) = {round(d, 3)} A - Rel. E = {round(e-min_e, 2)} kcal/mol')
 
         d += step
         # modify the target distance and reiterate
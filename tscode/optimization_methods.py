@@ -19,7 +19,6 @@ GNU General Public License for more details.
 import time
 from copy import deepcopy
 
-import networkx as nx
 import numpy as np
 from scipy.spatial.transform import Rotation as R
 
@@ -29,7 +28,8 @@ from tscode.calculators._gaussian import gaussian_opt
 from tscode.calculators._mopac import mopac_opt
 from tscode.calculators._orca import orca_opt
 from tscode.calculators._xtb import xtb_opt
-from tscode.python_functions import prune_conformers_rmsd
+from tscode.python_functions import (get_similarity_clusters,
+                                     prune_conformers_rmsd)
 from tscode.settings import DEFAULT_LEVELS, FF_CALC
 from tscode.utils import (loadbar, molecule_check, pt, scramble_check,
                           time_to_string, write_xyz)
@@ -338,15 +338,12 @@ def prune_by_moment_of_inertia(structures, atomnos, max_deviation=1e-2):
     of them is kept.
     '''
 
-    heavy_structures = np.array([structure[atomnos != 1] for structure in structures])
+    heavy_structures = structures[:, atomnos != 1]
     heavy_masses = np.array([pt[a].mass for a in atomnos if a != 1])
 
     matches = get_moi_similarity_matches(heavy_structures, heavy_masses, max_deviation=max_deviation)
 
-    G = nx.Graph(matches)
-
-    subgraphs = [G.subgraph(c) for c in nx.connected_components(G)]
-    groups = [tuple(graph.nodes) for graph in subgraphs]
+    groups = get_similarity_clusters(matches, structures.shape[0])
 
     best_of_cluster = [group[0] for group in groups]
 
@@ -15,8 +15,13 @@ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 
 '''
+import numpy as np
 from periodictable import core, covalent_radius, mass
 
 pt = core.PeriodicTable(table="H=1")
 covalent_radius.init(pt)
-mass.init(pt)
\ No newline at end of file
+mass.init(pt)
+
+element_symbols = np.array([pt[z].symbol for z in range(max(el.number for el in pt)+1)], dtype=object)
+# element symbols indexed by atomic number, so that an array
+# of atomnos is converted to symbols with a single gather
@@ -16,10 +16,10 @@ GNU General Public License for more details.
 
 '''
 
-import networkx as nx
 import numpy as np
 from numba import njit, float32, prange
-from rmsd import kabsch_rotate
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 from tscode.algebra import all_dists, dihedral
 
@@ -48,7 +48,7 @@ def torsion_comp_check(coords, torsion, mask, thresh=1.5, max_clashes=0) -> bool
     m2 = coords[antimask]
     # fragment identification by boolean masking
 
-    return 0 if np.count_nonzero(all_dists(m2,m1) < thresh) > max_clashes else 1
+    return 0 if count_clashes(m2, m1, thresh*thresh, max_clashes) > max_clashes else 1
  
 @njit
 def compenetration_check(coords, ids=None, thresh=1.5, max_clashes=0) -> bool:
@@ -62,11 +62,16 @@ def compenetration_check(coords, ids=None, thresh=1.5, max_clashes=0) -> bool:
     '''
 
     if ids is None:
+        dist_mat = all_dists(coords,coords)
+        # computed once and reused for both bounds
+
         return 0 if np.count_nonzero(
-                                     (all_dists(coords,coords) < 0.95) & (
-                                      all_dists(coords,coords) > 0)
+                                     (dist_mat < 0.95) & (dist_mat > 0)
                                     ) > max_clashes else 1
 
+    thresh2 = thresh * thresh
+    # squared distances are compared, sparing the sqrt
+
     if len(ids) == 2:
     # Bimolecular
 
@@ -74,7 +79,7 @@ def compenetration_check(coords, ids=None, thresh=1.5, max_clashes=0) -> bool:
         m2 = coords[ids[0]:]
         # fragment identification by length (contiguous)
 
-        return 0 if np.count_nonzero(all_dists(m2,m1) < thresh) > max_clashes else 1
+        return 0 if count_clashes(m2, m1, thresh2, max_clashes) > max_clashes else 1
 
     # if len(ids) == 3:
 
@@ -86,23 +91,64 @@ def compenetration_check(coords, ids=None, thresh=1.5, max_clashes=0) -> bool:
     m3 = coords[ids[0]+ids[1]:]
     # fragment identification by length (contiguous)
 
-    clashes += np.count_nonzero(all_dists(m2,m1) < thresh)
+    clashes += count_clashes(m2, m1, thresh2, max_clashes-clashes)
     if clashes > max_clashes:
         return 0
 
-    clashes += np.count_nonzero(all_dists(m3,m2) < thresh)
+    clashes += count_clashes(m3, m2, thresh2, max_clashes-clashes)
     if clashes > max_clashes:
         return 0
 
-    clashes += np.count_nonzero(all_dists(m1,m3) < thresh)
+    clashes += count_clashes(m1, m3, thresh2, max_clashes-clashes)
     if clashes > max_clashes:
         return 0
 
     return 1
 
+@njit(fastmath=True)
+def count_clashes(m1, m2, thresh2, max_clashes):
+    '''
+    m1, m2: 3D coordinates of two fragments
+    thresh2: squared threshold distance for two atoms to be clashing
+    max_clashes: counting stops as soon as this value is exceeded
+    returns the number of clashing atom pairs between m1 and m2
+    (up to max_clashes + 1)
+    '''
+    clashes = 0
+
+    if m1.shape[0] == 0 or m2.shape[0] == 0:
+        return clashes
+
+    thresh = np.sqrt(thresh2)
+    lo = np.empty(3)
+    hi = np.empty(3)
+    for k in range(3):
+        lo[k] = m2[:,k].min() - thresh
+        hi[k] = m2[:,k].max() + thresh
+    # bounding box of m2, expanded by the threshold: atoms
+    # of m1 outside of it cannot clash with any atom of m2
+
+    for i in range(m1.shape[0]):
+
+        if (m1[i,0] < lo[0] or m1[i,0] > hi[0] or
+            m1[i,1] < lo[1] or m1[i,1] > hi[1] or
+            m1[i,2] < lo[2] or m1[i,2] > hi[2]):
+            continue
+
+        for j in range(m2.shape[0]):
+            dx = m1[i,0] - m2[j,0]
+            dy = m1[i,1] - m2[j,1]
+            dz = m1[i,2] - m2[j,2]
+            if dx*dx + dy*dy + dz*dz < thresh2:
+                clashes += 1
+                if clashes > max_clashes:
+                    return clashes
+    return clashes
+
 def scramble(array, sequence):
-    return np.array([array[s] for s in sequence])
+    return np.asarray(array)[np.asarray(sequence, dtype=int)]
 
+@njit
 def rmsd_and_max(P, Q):
     '''
     ** ADAPTED FROM THE PYTHON RMSD LIBRARY **
@@ -125,16 +171,157 @@ def rmsd_and_max(P, Q):
         maximum deviation value
     '''
 
-    Q = Q - Q.mean(axis=0)
-    P = P - P.mean(axis=0)
-    P = kabsch_rotate(P, Q)
+    Q = Q - np.sum(Q, axis=0) / Q.shape[0]
+    P = P - np.sum(P, axis=0) / P.shape[0]
+
+    C = np.ascontiguousarray(P.T) @ Q
+    V, S, W = np.linalg.svd(C)
+
+    if np.linalg.det(V) * np.linalg.det(W) < 0.0:
+        V[:, -1] = -V[:, -1]
+    # correct improper rotation
+
+    P = P @ (V @ W)
 
     diff = Q - P
-    rmsd = np.sqrt((diff * diff).sum() / len(diff))
-    max_delta = np.linalg.norm(diff, axis=1).max()
+    deviations = np.sqrt(np.sum(diff * diff, axis=1))
+    rmsd = np.sqrt(np.sum(diff * diff) / len(diff))
+    max_delta = np.max(deviations)
 
     return rmsd, max_delta
 
+@njit
+def get_first_similar(ref, targets, G_ref, G_targets, max_rmsd, max_delta):
+    '''
+    Returns the index of the first structure in targets that is
+    similar to ref, that is with both RMSD < max_rmsd and maximum
+    deviation < max_delta, or -1 if none is. All structures must
+    be centered in the origin, G_ref and G_targets are their inner
+    products (see rmsd_batch).
+    '''
+    rmsds = rmsd_batch(ref, targets, G_ref, G_targets)
+    # RMSD of the whole row at once: the slower Kabsch
+    # rotation is only needed for the max deviation of
+    # candidates under threshold
+
+    for m in range(targets.shape[0]):
+        if rmsds[m] < max_rmsd:
+            _, max_dev = rmsd_and_max(ref, targets[m])
+            if max_dev < max_delta:
+                return m
+
+    return -1
+
+@njit(parallel=True)
+def rmsd_batch(ref, targets, G_ref, G_targets):
+    '''
+    Returns the RMSD of each structure in targets from ref, after
+    optimal superposition. Pairs are independent and are
+    distributed over the available cores.
+
+    Parameters
+    ----------
+    ref : array
+        (N,3) matrix, where N is points, centered in the origin.
+    targets : array
+        (M,N,3) array of M structures to be compared to ref,
+        each centered in the origin.
+    G_ref : float
+        inner product of ref with itself (sum of squared coordinates).
+    G_targets : array
+        (M,) array of inner products of each target with itself.
+
+    Returns
+    -------
+    rmsds : array
+        (M,) array of root-mean squared deviations
+    '''
+    rmsds = np.empty(targets.shape[0])
+    for m in prange(targets.shape[0]):
+        rmsds[m] = qcp_rmsd(ref, targets[m], G_ref + G_targets[m])
+    return rmsds
+
+@njit
+def qcp_rmsd(P, Q, G):
+    '''
+    Returns the RMSD between P and Q, (N,3) matrices centered in the
+    origin, after optimal superposition. G is the sum of their inner
+    products with themselves. Uses the Quaternion Characteristic
+    Polynomial method (Theobald, Acta Cryst. 2005, A61, 478): the largest
+    eigenvalue of the 4x4 key matrix is found by Newton iterations
+    on its characteristic polynomial, and no rotation is computed.
+    '''
+    n = P.shape[0]
+
+    S = np.zeros((3,3))
+    for i in range(n):
+        for a in range(3):
+            for b in range(3):
+                S[a,b] += P[i,a]*Q[i,b]
+    # cross-covariance matrix
+
+    Sxx, Sxy, Sxz = S[0,0], S[0,1], S[0,2]
+    Syx, Syy, Syz = S[1,0], S[1,1], S[1,2]
+    Szx, Szy, Szz = S[2,0], S[2,1], S[2,2]
+
+    Sxx2, Syy2, Szz2 = Sxx*Sxx, Syy*Syy, Szz*Szz
+    Sxy2, Syz2, Sxz2 = Sxy*Sxy, Syz*Syz, Sxz*Sxz
+    Syx2, Szy2, Szx2 = Syx*Syx, Szy*Szy, Szx*Szx
+
+    SyzSzymSyySzz2 = 2.0*(Syz*Szy - Syy*Szz)
+    Sxx2Syy2Szz2Syz2Szy2 = Syy2 + Szz2 - Sxx2 + Syz2 + Szy2
+    Sxy2Sxz2Syx2Szx2 = Sxy2 + Sxz2 - Syx2 - Szx2
+
+    SxzpSzx, SyzpSzy, SxypSyx = Sxz + Szx, Syz + Szy, Sxy + Syx
+    SyzmSzy, SxzmSzx, SxymSyx = Syz - Szy, Sxz - Szx, Sxy - Syx
+    SxxpSyy, SxxmSyy = Sxx + Syy, Sxx - Syy
+
+    # coefficients of the characteristic polynomial
+    # x^4 + C2*x^2 + C1*x + C0 of the key matrix
+    C2 = -2.0*(Sxx2 + Syy2 + Szz2 + Sxy2 + Syx2 + Sxz2 + Szx2 + Syz2 + Szy2)
+    C1 = 8.0*(Sxx*Syz*Szy + Syy*Szx*Sxz + Szz*Sxy*Syx -
+              Sxx*Syy*Szz - Syz*Szx*Sxy - Szy*Syx*Sxz)
+    C0 = (Sxy2Sxz2Syx2Szx2 * Sxy2Sxz2Syx2Szx2 +
+          (Sxx2Syy2Szz2Syz2Szy2 + SyzSzymSyySzz2) * (Sxx2Syy2Szz2Syz2Szy2 - SyzSzymSyySzz2) +
+          (-SxzpSzx*SyzmSzy + SxymSyx*(SxxmSyy - Szz)) * (-SxzmSzx*SyzpSzy + SxymSyx*(SxxmSyy + Szz)) +
+          (-SxzpSzx*SyzpSzy - SxypSyx*(SxxpSyy - Szz)) * (-SxzmSzx*SyzmSzy - SxypSyx*(SxxpSyy + Szz)) +
+          (SxypSyx*SyzpSzy + SxzpSzx*(SxxmSyy + Szz)) * (-SxymSyx*SyzmSzy + SxzpSzx*(SxxpSyy + Szz)) +
+          (SxypSyx*SyzmSzy + SxzmSzx*(SxxmSyy - Szz)) * (-SxymSyx*SyzpSzy + SxzmSzx*(SxxpSyy - Szz)))
+
+    # Newton-Raphson from the upper bound (Ga + Gb)/2
+    lambda_max = G / 2
+    for _ in range(50):
+        old = lambda_max
+        x2 = lambda_max*lambda_max
+        b = (x2 + C2)*lambda_max
+        a = b + C1
+        delta = (a*lambda_max + C0) / (2.0*x2*lambda_max + b + a)
+        lambda_max -= delta
+        if abs(lambda_max - old) < abs(1e-11*lambda_max):
+            break
+
+    return np.sqrt(max(G - 2*lambda_max, 0.) / n)
+
+def get_similarity_clusters(matches, n):
+    '''
+    Returns the clusters of indices (out of n) connected by the (i, j)
+    pairs in matches, as sorted arrays. Indices without any match are
+    not part of any cluster. Connected components are found by scipy
+    on a sparse adjacency matrix.
+    '''
+    if len(matches) == 0:
+        return []
+
+    rows, cols = zip(*matches)
+    adjacency = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(adjacency, directed=False)
+
+    order = np.argsort(labels, kind='stable')
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    # indices sorted by cluster label, and where each cluster starts
+
+    return [cluster for cluster in np.split(order, boundaries) if len(cluster) > 1]
+
 def fast_score(coords, close=1.3, far=3):
     '''
     return a fast to compute score
@@ -160,7 +347,18 @@ def prune_conformers_rmsd(structures, atomnos, max_rmsd=0.25, max_delta=None, ve
     max_delta = max_rmsd * 2 if max_delta is None else max_delta
 
     heavy_atoms = (atomnos != 1)
-    heavy_structures = np.array([structure[heavy_atoms] for structure in structures])
+    heavy_structures = structures[:, heavy_atoms]
+
+    heavy_structures -= heavy_structures.mean(axis=1, keepdims=True)
+    inner_products = np.einsum('nij,nij->n', heavy_structures, heavy_structures)
+    # centering and inner products are computed once per structure,
+    # rather than once per RMSD evaluation
+
+    heavy_structures = heavy_structures.astype(np.float32)
+    # single precision is plenty for Å-scale thresholds and halves
+    # memory traffic in the pairwise kernels: the covariance and inner
+    # products are still accumulated in double precision, which keeps
+    # the Newton iterations on the QCP polynomial stable
 
     cache_set = set()
     final_mask = np.ones(structures.shape[0], dtype=bool)
@@ -186,39 +384,38 @@ def prune_conformers_rmsd(structures, atomnos, max_rmsd=0.25, max_delta=None, ve
                 else:
                     _l = len(range(d*step, int(d*(step+1))))
 
-                similarity_mat = np.zeros((_l, _l))
+                matches = []
 
                 for i_rel in range(_l):
-                    for j_rel in range(i_rel+1,_l):
 
-                        i_abs = i_rel+(d*step)
-                        j_abs = j_rel+(d*step)
+                    i_abs = i_rel+(d*step)
 
-                        if (i_abs, j_abs) not in cache_set:
-                        # if we have already performed the comparison,
-                        # structures were not similar and we can skip them
+                    j_abs_list = [j_rel+(d*step) for j_rel in range(i_rel+1,_l)
+                                  if (i_abs, j_rel+(d*step)) not in cache_set]
+                    # if we have already performed the comparison,
+                    # structures were not similar and we can skip them
 
-                            rmsd, max_dev = rmsd_and_max(heavy_structures[i_abs],
-                                                         heavy_structures[j_abs])
+                    if not j_abs_list:
+                        continue
 
-                            if rmsd < max_rmsd and max_dev < max_delta:
-                                similarity_mat[i_rel,j_rel] = 1
-                                break
+                    m = get_first_similar(heavy_structures[i_abs],
+                                          heavy_structures[j_abs_list],
+                                          inner_products[i_abs],
+                                          inner_products[j_abs_list],
+                                          max_rmsd,
+                                          max_delta)
 
-                for i_rel, j_rel in zip(*np.where(similarity_mat == False)):
-                    i_abs = i_rel+(d*step)
-                    j_abs = j_rel+(d*step)
-                    cache_set.add((i_abs, j_abs))
-                    # adding indices of structures that are considered equal,
-                    # so as not to repeat computing their RMSD
-                    # Their index accounts for their position in the initial
-                    # array (absolute index)
+                    compared = j_abs_list if m == -1 else j_abs_list[:m]
+                    cache_set.update([(i_abs, j_abs) for j_abs in compared])
+                    # adding indices of structures that were compared
+                    # and found not similar, so as not to repeat
+                    # computing their RMSD. Their index accounts for
+                    # their position in the initial array (absolute index)
 
-                matches = [(i,j) for i,j in zip(*np.where(similarity_mat))]
-                g = nx.Graph(matches)
+                    if m != -1:
+                        matches.append((i_rel, j_abs_list[m]-(d*step)))
 
-                subgraphs = [g.subgraph(c) for c in nx.connected_components(g)]
-                groups = [tuple(graph.nodes) for graph in subgraphs]
+                groups = get_similarity_clusters(matches, _l)
 
                 best_of_cluster = [sorted(group, key=lambda i: fast_score(structures[i]))[0] for group in groups]
                 # of each cluster, keep the structure that looks the best
@@ -272,7 +469,7 @@ def prune_conformers_tfd(structures, quadruplets, thresh=10, verbose=False):
                 else:
                     _l = len(range(d*step, int(d*(step+1))))
 
-                similarity_mat = np.zeros((_l, _l))
+                matches = []
 
                 for i_rel in range(_l):
                     for j_rel in range(i_rel+1,_l):
@@ -288,23 +485,16 @@ def prune_conformers_tfd(structures, quadruplets, thresh=10, verbose=False):
                                               tf_mat[j_abs],
                                               thresh=thresh):
 
-                                similarity_mat[i_rel,j_rel] = 1
+                                matches.append((i_rel, j_rel))
                                 break
 
-                for i_rel, j_rel in zip(*np.where(similarity_mat == False)):
-                    i_abs = i_rel+(d*step)
-                    j_abs = j_rel+(d*step)
-                    cache_set.add((i_abs, j_abs))
-                    # adding indices of structures that are considered equal,
-                    # so as not to repeat computing their TFD
-                    # Their index accounts for their position in the initial
-                    # array (absolute index)
-
-                matches = [(i,j) for i,j in zip(*np.where(similarity_mat))]
-                g = nx.Graph(matches)
-
-                subgraphs = [g.subgraph(c) for c in nx.connected_components(g)]
-                groups = [tuple(graph.nodes) for graph in subgraphs]
+                            cache_set.add((i_abs, j_abs))
+                            # adding indices of structures that were compared
+                            # and found not similar, so as not to repeat
+                            # computing their TFD. Their index accounts for
+                            # their position in the initial array (absolute index)
+
+                groups = get_similarity_clusters(matches, _l)
 
                 best_of_cluster = [sorted(group, key=lambda i: fast_score(structures[i]))[0] for group in groups]
                 # of each cluster, keep the structure that looks the best
@@ -20,9 +20,10 @@ import sys
 
 def run_tests():
     
+    import logging
     import os
     import time
-    from subprocess import CalledProcessError
+    import traceback
 
     os.chdir(os.path.dirname(os.path.realpath(__file__)))
 
@@ -37,9 +38,10 @@ def run_tests():
     from ase.optimize import LBFGS
 
     from tscode.ase_manipulations import get_ase_calc
+    from tscode.embedder import Embedder
     from tscode.optimization_methods import opt_funcs_dict
     from tscode.utils import (HiddenPrints, clean_directory, loadbar, read_xyz,
-                              run_command, time_to_string)
+                              time_to_string)
 
     os.chdir('tests')
 
@@ -109,6 +111,22 @@ def run_tests():
             clean_directory()
             print(f'{FF_CALC} ASE calculator works.')
 
+    ##########################################################################
+
+    from tscode.embedder_options import OptionSetter, keywords_list, keywords_set
+
+    no_setter = [kw for kw in keywords_list if not hasattr(OptionSetter, kw.lower())]
+    if no_setter:
+        raise Exception(f'Keywords without a setter function in OptionSetter: {no_setter}')
+
+    no_keyword = [name for name, attr in vars(OptionSetter).items()
+                  if callable(attr) and not name.startswith('_') and
+                  name != 'set_options' and name.upper() not in keywords_set]
+    if no_keyword:
+        raise Exception(f'OptionSetter functions not listed in keywords_list: {no_keyword}')
+
+    print('\nAll keywords have a setter function.')
+
     print('\nNo installation faults detected with the current settings. Running tests.')
 
     ##########################################################################
@@ -128,14 +146,39 @@ def run_tests():
         loadbar(i, len(tests), f'Running TSCoDe tests ({name}): ')
         
         t_start = time.perf_counter()
+        cwd = os.getcwd()
+        embedder = None
         try:
             with HiddenPrints():
-                run_command(f'python -m tscode {f} -n {name}')
-
-        except CalledProcessError as error:
+                embedder = Embedder(f, stamp=name)
+                embedder.run()
+                # run in-process, sparing interpreter startup and imports for every test
+
+        except SystemExit as error:
+            if error.code not in (None, 0):
+                print('\n\n--> An error occurred:\n')
+                print(error.code)
+                sys.exit()
+            # normal termination of a run calls sys.exit(), while
+            # input and setup errors raise SystemExit with a message
+
+        except Exception:
             print('\n\n--> An error occurred:\n')
-            print(error.stderr.decode("utf-8"))
+            traceback.print_exc()
             sys.exit()
+
+        finally:
+            if embedder is not None:
+                embedder.logfile.close()
+
+            for handler in logging.root.handlers[:]:
+                logging.root.removeHandler(handler)
+                handler.close()
+            # each Embedder calls logging.basicConfig on its own log
+            # file, which only takes effect if no handler is left over
+
+            os.chdir(cwd)
+            # Embedder moves to the input file directory
                     
         t_end = time.perf_counter()
         times.append(t_end-t_start)
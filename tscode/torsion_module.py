@@ -32,7 +32,8 @@ from tscode.graph_manipulations import (_get_phenyl_ids, findPaths, get_sp_n,
 from tscode.hypermolecule_class import align_structures, graphize
 from tscode.optimization_methods import optimize
 from tscode.pt import pt
-from tscode.python_functions import prune_conformers_tfd, torsion_comp_check
+from tscode.python_functions import (get_similarity_clusters,
+                                     prune_conformers_tfd, torsion_comp_check)
 from tscode.settings import DEFAULT_FF_LEVELS, FF_CALC
 from tscode.utils import (cartesian_product, flatten, get_double_bonds_indices,
                           loadbar, rotate_dihedral, time_to_string, write_xyz)
@@ -1020,7 +1021,7 @@ def prune_conformers_rmsd_rot_corr(structures, atomnos, graph, max_rmsd=0.25, ve
     maximum deviation < max_delta.
     '''
 
-    structures = np.array([s - s.mean(axis=0) for s in structures])
+    structures = structures - structures.mean(axis=1, keepdims=True)
     ref = structures[0]
 
     # add hydrogen bonds to molecular graph 
@@ -1095,7 +1096,7 @@ def prune_conformers_rmsd_rot_corr(structures, atomnos, graph, max_rmsd=0.25, ve
                 else:
                     _l = len(range(d*step, int(d*(step+1))))
 
-                similarity_mat = np.zeros((_l, _l))
+                matches = []
 
                 for i_rel in range(_l):
                     for j_rel in range(i_rel+1,_l):
@@ -1115,23 +1116,16 @@ def prune_conformers_rmsd_rot_corr(structures, atomnos, graph, max_rmsd=0.25, ve
                                                                angles)
 
                             if rmsd < max_rmsd:
-                                similarity_mat[i_rel,j_rel] = 1
+                                matches.append((i_rel, j_rel))
                                 break
 
-                for i_rel, j_rel in zip(*np.where(similarity_mat == False)):
-                    i_abs = i_rel+(d*step)
-                    j_abs = j_rel+(d*step)
-                    cache_set.add((i_abs, j_abs))
-                    # adding indices of structures that are considered equal,
-                    # so as not to repeat computing their RMSD
-                    # Their index accounts for their position in the initial
-                    # array (absolute index)
+                            cache_set.add((i_abs, j_abs))
+                            # adding indices of structures that were compared
+                            # and found not similar, so as not to repeat
+                            # computing their RMSD. Their index accounts for
+                            # their position in the initial array (absolute index)
 
-                matches = [(i,j) for i,j in zip(*np.where(similarity_mat))]
-                g = nx.Graph(matches)
-
-                subgraphs = [g.subgraph(c) for c in nx.connected_components(g)]
-                groups = [tuple(graph.nodes) for graph in subgraphs]
+                groups = get_similarity_clusters(matches, _l)
 
                 best_of_cluster = [group[0] for group in groups]
                 # of each cluster, keep the fist structure
@@ -28,7 +28,7 @@ from cclib.io import ccread
 from tscode.algebra import norm_of, rot_mat_from_pointer
 from tscode.errors import TriangleError
 from tscode.graph_manipulations import graphize
-from tscode.pt import pt
+from tscode.pt import element_symbols, pt
 
 
 class suppress_stdout_stderr(object):
@@ -111,12 +111,12 @@ def write_xyz(coords:np.array, atomnos:np.array, output, title='temp'):
     '''
     assert atomnos.shape[0] == coords.shape[0]
     assert coords.shape[1] == 3
-    string = ''
-    string += str(len(coords))
-    string += f'\n{title}\n'
-    for i, atom in enumerate(coords):
-        string += '%s     % .6f % .6f % .6f\n' % (pt[atomnos[i]].symbol, atom[0], atom[1], atom[2])
-    output.write(string)
+    lines = [str(len(coords)), title]
+    lines.extend(['%s     % .6f % .6f % .6f' % (symbol, atom[0], atom[1], atom[2])
+                  for symbol, atom in zip(element_symbols[atomnos], coords.tolist())])
+    # coordinates are converted to Python floats in one call, and the
+    # string is joined once rather than grown atom by atom
+    output.write('\n'.join(lines) + '\n')
 
 def read_xyz(filename):
     '''